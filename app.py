@@ -1,10 +1,13 @@
+import math
 import os
 import time
 
+import fitz
 import streamlit as st
 from fitz.utils import getColorList
 
-from pdf_highlighter import edit_pdfs
+from pdf_highlighter import edit_pdfs, file_hash
+from semantic_search import semantic_search
 
 cl = getColorList()
 colors = [
@@ -28,6 +31,14 @@ colors = [
 ]
 
 
+# Folder of the rendered page previews
+PREVIEW_CACHE_DIR = ".preview_cache"
+# Size of the preview cache before the least recently used previews are evicted
+PREVIEW_CACHE_MAX_BYTES = 200 * 2**20
+# Number of previews rendered at once
+PREVIEW_BATCH_SIZE = 12
+
+
 def baloon_animation():
     progress_bar = st.progress(0)
     status_text = st.empty()
@@ -80,7 +91,22 @@ def data_input():
     if overwrite is False:
         output_file = st.text_input("Enter the name of the output file")
 
-    return {"path": path, "overwrite": overwrite, "output_file": output_file}
+    low_memory = st.checkbox(
+        "Check to process page by page with bounded memory (for very large files)"
+    )
+    memory_budget = None
+    if low_memory:
+        memory_budget = st.number_input(
+            "Enter the memory budget in MB", min_value=64, value=1024
+        )
+
+    return {
+        "path": path,
+        "overwrite": overwrite,
+        "output_file": output_file,
+        "low_memory": low_memory,
+        "memory_budget": memory_budget,
+    }
 
 
 def select_action():
@@ -90,6 +116,7 @@ def select_action():
         [
             "Highlight",
             "Extract Context",
+            "Semantic Search",
             "Underline",
             "Strikeout",
             "Remove annotations",
@@ -134,9 +161,35 @@ def search_parameters_input(action):
     search_strings = [None]
 
     context_size = None
+    match_mode = "regex"
+    max_edits = 1
+    top_k = None
+    highlight = False
     if action != "Remove":
         search_strings = extract_search_terms()
 
+        if action == "Semantic Search":
+            top_k = st.number_input(
+                "Enter the number of passages to return per search term",
+                min_value=1,
+                max_value=50,
+                value=5,
+            )
+            highlight = st.checkbox("Check to highlight the found passages")
+        elif action != "Extract Context":
+            match_mode = st.selectbox(
+                "Select the matching mode",
+                ["regex", "fuzzy"],
+                help="Fuzzy matching tolerates ligatures, hyphenation and OCR noise",
+            )
+            if match_mode == "fuzzy":
+                max_edits = st.number_input(
+                    "Enter the maximum number of edits of a match",
+                    min_value=0,
+                    max_value=5,
+                    value=1,
+                )
+
         if action == "Extract Context":
             context_size = str(
                 st.number_input(
@@ -147,10 +200,27 @@ def search_parameters_input(action):
                 )
             )
 
-    return {"search_strings": search_strings, "context_size": context_size}
-
-
-def run(search_strings, context_size, action, path, output_file):
+    return {
+        "search_strings": search_strings,
+        "context_size": context_size,
+        "match_mode": match_mode,
+        "max_edits": max_edits,
+        "top_k": top_k,
+        "highlight": highlight,
+    }
+
+
+def run(
+    search_strings,
+    context_size,
+    action,
+    path,
+    output_file,
+    match_mode,
+    max_edits,
+    low_memory,
+    memory_budget,
+):
     try:
         outputs = []
         for i, search_str in enumerate(search_strings):
@@ -166,6 +236,10 @@ def run(search_strings, context_size, action, path, output_file):
                     "output_file": output_file,
                     "recursive": True,
                     "context_size": context_size,
+                    "match_mode": match_mode,
+                    "max_edits": max_edits,
+                    "low_memory": low_memory,
+                    "memory_budget": memory_budget,
                 }
             )
             outputs.append(output)
@@ -174,6 +248,20 @@ def run(search_strings, context_size, action, path, output_file):
                 st.write("Extracted context:")
                 st.write(output)
 
+        if action not in ("Extract Context", "Remove"):
+            # Keep the pages with hits of each file for the previews across reruns
+            preview_pages = {}
+            for output in outputs:
+                for result in output:
+                    preview_pages.setdefault(result["filename"], set()).update(
+                        result["pages"]
+                    )
+            st.session_state["preview_pages"] = {
+                filename: sorted(pages)
+                for filename, pages in preview_pages.items()
+                if pages
+            }
+
     except PermissionError:
         st.write(
             "PermissionError: "
@@ -183,6 +271,115 @@ def run(search_strings, context_size, action, path, output_file):
         st.write(e)
 
 
+def run_semantic_search(search_strings, top_k, highlight, path):
+    queries = [search_str for search_str in search_strings if search_str != ""]
+    if not queries:
+        st.write("Please enter at least one search term.")
+        return
+    try:
+        output = semantic_search(
+            {
+                "input_path": path,
+                "queries": queries,
+                "top_k": top_k,
+                "highlight": highlight,
+                "color": colors[0],
+                "recursive": True,
+            }
+        )
+        st.write("Closest passages:")
+        st.write(output)
+
+    except PermissionError:
+        st.write(
+            "PermissionError: Please close the pdf file/s you are trying to edit."
+        )
+    except Exception as e:
+        st.write(e)
+
+
+def cached_file_hash(input_file):
+    """
+    Hashes the file once per modification instead of on every rerun
+    """
+    stat = os.stat(input_file)
+    key = (input_file, stat.st_size, stat.st_mtime_ns)
+    file_hashes = st.session_state.setdefault("file_hashes", {})
+    if key not in file_hashes:
+        file_hashes[key] = file_hash(input_file)
+    return file_hashes[key]
+
+
+def evict_previews():
+    """
+    Deletes the least recently used previews once the cache is over its size
+    """
+    previews = sorted(
+        (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+        for entry in os.scandir(PREVIEW_CACHE_DIR)
+        if entry.name.endswith(".png")
+    )
+    cache_size = sum(size for _, size, _ in previews)
+    for _, size, path in previews:
+        if cache_size <= PREVIEW_CACHE_MAX_BYTES:
+            break
+        os.remove(path)
+        cache_size -= size
+
+
+def page_preview(input_file, page_num, dpi):
+    """
+    Renders a page of the PDF File to a PNG image
+    Previews are cached on disk by file hash, page and DPI
+    """
+    preview = os.path.join(
+        PREVIEW_CACHE_DIR, f"{cached_file_hash(input_file)}_{page_num}_{dpi}.png"
+    )
+    if os.path.isfile(preview):
+        # Mark the preview as recently used
+        os.utime(preview)
+        return preview
+
+    os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
+    pdfDoc = fitz.open(input_file)
+    pixmap = pdfDoc[page_num - 1].get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
+    # Write to a temporary file so a concurrent rerun never reads a partial image
+    pixmap.save(preview + ".tmp.png")
+    os.replace(preview + ".tmp.png", preview)
+    pdfDoc.close()
+    evict_previews()
+    return preview
+
+
+def page_previews():
+    preview_pages = st.session_state.get("preview_pages")
+    if not preview_pages:
+        return
+
+    st.subheader("Pages with hits")
+    filename = st.selectbox("Select the file to preview", list(preview_pages))
+    dpi = st.slider("Preview resolution (DPI)", min_value=30, max_value=100, value=50)
+    pages = preview_pages[filename]
+    # Only render the pages of the selected batch
+    num_batches = math.ceil(len(pages) / PREVIEW_BATCH_SIZE)
+    batch = 1
+    if num_batches > 1:
+        batch = st.number_input(
+            f"Select the batch of pages to preview (of {num_batches})",
+            min_value=1,
+            max_value=num_batches,
+            value=1,
+        )
+    batch_pages = pages[(batch - 1) * PREVIEW_BATCH_SIZE : batch * PREVIEW_BATCH_SIZE]
+    if not os.path.isfile(filename):
+        st.write(f"{filename} no longer exists.")
+        return
+    st.image(
+        [page_preview(filename, page_num, dpi) for page_num in batch_pages],
+        caption=[f"Page {page_num}" for page_num in batch_pages],
+    )
+
+
 def main():
     st.title("Sweet Dee Dee's PDF Editor")
 
@@ -202,18 +399,33 @@ def main():
 
     # click button to run the edit_pdfs function with the arguments above
     if st.button("Run"):
-        run(
-            search_params["search_strings"],
-            search_params["context_size"],
-            action,
-            data["path"],
-            data["output_file"],
-        )
+        if action == "Semantic Search":
+            run_semantic_search(
+                search_params["search_strings"],
+                search_params["top_k"],
+                search_params["highlight"],
+                data["path"],
+            )
+        else:
+            run(
+                search_params["search_strings"],
+                search_params["context_size"],
+                action,
+                data["path"],
+                data["output_file"],
+                search_params["match_mode"],
+                search_params["max_edits"],
+                data["low_memory"],
+                data["memory_budget"],
+            )
 
         # Display a message to the user that the function has been applied
         # Provide a download link or link to the file in the output folder
         st.write("Done! I love you!")
 
+    # Browse the pages with hits of the last run
+    page_previews()
+
 
 if __name__ == "__main__":
     main()
@@ -237,7 +449,7 @@ if __name__ == "__main__":
 # and rows would be hits (context/clause) for that term in a pdf
 # and columns would be corresponding to different pdfs
 #
-# semantic search mode
+# semantic search mode (see semantic_search.py)
 #
 #
 # """
@@ -1,13 +1,112 @@
 # Import Libraries
 import argparse
+import gc
+import gzip
+import hashlib
+import json
 import os
 import re
+import shutil
+import sys
+import tempfile
 from io import BytesIO
 from typing import Tuple
 
 import fitz
 import pandas as pd
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def file_hash(input_file: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(input_file, mode="rb") as f:
+        # Read in chunks so large PDFs are not loaded into memory at once
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_memory():
+    """
+    Gets the resident memory of the process in MB, None if it cannot be measured
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_memory():
+    """
+    Gets the peak resident memory of the process in MB, None if it cannot be measured
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    if psutil is not None:
+        memory_info = psutil.Process().memory_info()
+        # peak_wset is the peak working set on Windows
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 2**20
+    return None
+
+
+def release_memory(memory_budget: int = None):
+    """
+    Flushes the MuPDF caches and collects garbage
+    With a memory budget in MB, only does so when the resident memory exceeds it
+    """
+    memory = current_memory()
+    if memory_budget is None or memory is None or memory > memory_budget:
+        gc.collect()
+        fitz.TOOLS.store_shrink(100)
+
+
+def save_document(pdfDoc, output_file: str, low_memory: bool = False):
+    """
+    Saves and closes the PDF
+    In low memory mode the PDF is written to disk without an in-memory copy
+    """
+    if not low_memory:
+        # Save the generated PDF to memory buffer
+        output_buffer = BytesIO()
+        pdfDoc.save(output_buffer)
+        pdfDoc.close()
+        # Save the output buffer to the output file
+        with open(output_file, mode="wb") as f:
+            f.write(output_buffer.getbuffer())
+        return
+
+    # Write next to the output file as it may be the opened input file
+    fd, tmp_file = tempfile.mkstemp(
+        suffix=".pdf", dir=os.path.dirname(os.path.abspath(output_file))
+    )
+    os.close(fd)
+    try:
+        pdfDoc.save(tmp_file)
+        pdfDoc.close()
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
 
 def extract_info(input_file: str):
     """
@@ -44,89 +143,239 @@ def search_for_text(lines, search_str):
             yield result
 
 
-def redact_matching_data(page, matched_values):
+# Ligatures found in the text layer of PDFs and their expansions
+LIGATURES = {
+    "\ufb00": "ff",
+    "\ufb01": "fi",
+    "\ufb02": "fl",
+    "\ufb03": "ffi",
+    "\ufb04": "ffl",
+    "\ufb05": "st",
+    "\ufb06": "st",
+}
+SOFT_HYPHEN = "\u00ad"
+HYPHENS = "-\u2010\u2011" + SOFT_HYPHEN
+
+
+def normalize_text(text: str):
     """
-    Redacts matching values
+    Normalizes ligatures, soft hyphens, hyphenation and whitespace of the text
+    Returns the normalized text and the offset in text of each of its characters
     """
-    matches_found = 0
-    # Loop throughout matching values
-    for val in matched_values:
-        matches_found += 1
-        matching_val_area = page.search_for(val)
-        # Redact matching values
-        [
-            page.add_redact_annot(area, text=" ", fill=(0, 0, 0))
-            for area in matching_val_area
-        ]
-    # Apply the redaction
-    page.apply_redactions()
-    return matches_found
+    chars = []
+    offsets = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in HYPHENS:
+            # Join words hyphenated across a line break e.g. "classi-\nfication"
+            j = i + 1
+            while j < len(text) and text[j] in " \t\r":
+                j += 1
+            if j < len(text) and text[j] == "\n":
+                i = j + 1
+                while i < len(text) and text[i].isspace():
+                    i += 1
+                continue
+            if char == SOFT_HYPHEN:
+                i += 1
+                continue
+        if char.isspace():
+            # Collapse whitespace runs into a single space
+            if chars and chars[-1] != " ":
+                chars.append(" ")
+                offsets.append(i)
+        else:
+            for norm_char in LIGATURES.get(char, char).lower():
+                chars.append(norm_char)
+                offsets.append(i)
+        i += 1
+    return "".join(chars), offsets
 
 
-def frame_matching_data(page, matched_values):
+def _match_start(text: str, pattern: str, end: int, max_edits: int):
     """
-    frames matching values
+    Finds the start of the closest match of the pattern ending at end
     """
-    matches_found = 0
-    # Loop throughout matching values
-    for val in matched_values:
-        matches_found += 1
-        matching_val_area = page.search_for(val)
-        for area in matching_val_area:
-            if isinstance(area, fitz.fitz.Rect):
-                # Draw a rectangle around matched values
-                annot = page.add_rect_annot(area)
-                # , fill = fitz.utils.getColor('black')
-                annot.setColors(stroke=fitz.utils.getColor("red"))
-                # If you want to remove matched data
-                # page.addFreetext_annot(area, ' ')
-                annot.update()
-    return matches_found
+    # Align the reversed pattern with the text going backwards from end
+    window = text[max(0, end - len(pattern) - max_edits + 1) : end + 1][::-1]
+    previous = list(range(len(window) + 1))
+    for i, pattern_char in enumerate(reversed(pattern), start=1):
+        current = [i]
+        for j, text_char in enumerate(window, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (pattern_char != text_char),
+                )
+            )
+        previous = current
+    # Prefer the shortest of the closest matches
+    length = min(range(len(previous)), key=lambda j: (previous[j], j))
+    return end + 1 - length
+
+
+def approximate_search(text: str, pattern: str, max_edits: int = 1):
+    """
+    Search for the substrings of the text within max_edits edits of the pattern
+    Uses Myers' bit-parallel algorithm so the scan is linear in the text length
+    Yields the start, end and edit distance of each non overlapping match
+    """
+    if not pattern:
+        return
+    # A match needs at least one matching character
+    max_edits = min(max_edits, len(pattern) - 1)
+    # Bit mask of the positions of each character in the pattern
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << len(pattern)) - 1
+    last_bit = 1 << (len(pattern) - 1)
+    pv, mv, score = mask, 0, len(pattern)
+    scores = []
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last_bit:
+            score += 1
+        elif mh & last_bit:
+            score -= 1
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        scores.append(score)
+
+    last_end = -1
+    end = 0
+    while end < len(scores):
+        if scores[end] > max_edits:
+            end += 1
+            continue
+        # Move to the first of the best end positions among the overlapping ones
+        next_end = end + 1
+        while next_end < min(len(scores), end + len(pattern)):
+            if scores[next_end] < scores[end]:
+                end = next_end
+            next_end += 1
+        score = scores[end]
+        start = _match_start(text, pattern, end, max_edits)
+        if start > last_end:
+            last_end = end
+            yield start, end + 1, score
+        # Matches may start right after this end position
+        end += 1
+
+
+def get_page_chars(page):
+    """
+    Gets the page text together with the bounding box of each of its characters
+    """
+    chars = []
+    boxes = []
+    for block in page.get_text("rawdict")["blocks"]:
+        # Image blocks have no lines
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                for char in span["chars"]:
+                    chars.append(char["c"])
+                    boxes.append(fitz.Rect(char["bbox"]))
+            chars.append("\n")
+            boxes.append(None)
+    return "".join(chars), boxes
+
+
+def span_areas(boxes, start: int, end: int):
+    """
+    Merges the character boxes between start and end into one rectangle per line
+    """
+    areas = []
+    area = None
+    for box in boxes[start:end]:
+        if box is None:
+            # End of line
+            if area is not None:
+                areas.append(area)
+            area = None
+        else:
+            area = fitz.Rect(box) if area is None else area | box
+    if area is not None:
+        areas.append(area)
+    return areas
 
 
-def highlight_matching_data(page, matched_values, type, color="red"):
+def fuzzy_search_page(page, search_str: str, max_edits: int = 1):
     """
-    Highlight matching values
+    Search the page for approximate matches of the search string
+    Yields the matched text and its areas on the page
+    """
+    page_text, boxes = get_page_chars(page)
+    text, offsets = normalize_text(page_text)
+    pattern = normalize_text(search_str)[0].strip()
+    for start, end, _ in approximate_search(text, pattern, max_edits):
+        # Map the match back to the characters of the page
+        start, end = offsets[start], offsets[end - 1] + 1
+        yield page_text[start:end], span_areas(boxes, start, end)
+
+
+def annotate_matching_areas(page, matched_areas, action, color="yellow"):
+    """
+    Annotates the areas of each match according to the action
     """
     matches_found = 0
-    # Loop throughout matching values
-    for val in matched_values:
+    for areas in matched_areas:
+        if not areas:
+            continue
         matches_found += 1
-        matching_val_area = page.search_for(val)
-        # print("matching_val_area",matching_val_area)
-        highlight = None
-        if type == "Highlight":
-            highlight = page.add_highlight_annot(matching_val_area)
-        elif type == "Squiggly":
-            highlight = page.add_squiggly_annot(matching_val_area)
-        elif type == "Underline":
-            highlight = page.add_underline_annot(matching_val_area)
-        elif type == "Strikeout":
-            highlight = page.add_strikeout_annot(matching_val_area)
-        elif type == "FreeText":
-            highlight = page.add_freetext_annot(
-                rect=matching_val_area[0],
+        if action == "Redact":
+            for area in areas:
+                page.add_redact_annot(area, text=" ", fill=(0, 0, 0))
+            continue
+        if action == "Frame":
+            for area in areas:
+                annot = page.add_rect_annot(
+                    area.rect if isinstance(area, fitz.Quad) else area
+                )
+                annot.set_colors(stroke=fitz.utils.getColor("red"))
+                annot.update()
+            continue
+        if action == "Squiggly":
+            annot = page.add_squiggly_annot(areas)
+        elif action == "Underline":
+            annot = page.add_underline_annot(areas)
+        elif action == "Strikeout":
+            annot = page.add_strikeout_annot(areas)
+        elif action == "FreeText":
+            annot = page.add_freetext_annot(
+                rect=areas[0].rect if isinstance(areas[0], fitz.Quad) else areas[0],
                 text="",
                 fill_color=fitz.utils.getColor("blue"),
             )
-
         else:
-            highlight = page.add_highlight_annot(matching_val_area)
-        highlight.set_colors(stroke=fitz.utils.getColor(color))
-
-        highlight.update()
-        break
+            annot = page.add_highlight_annot(areas)
+        annot.set_colors(stroke=fitz.utils.getColor(color))
+        annot.update()
+    if action == "Redact":
+        # Apply the redaction
+        page.apply_redactions()
     return matches_found
 
 
 def extract_context(
-    input_file: str, search_str: str, pages: Tuple = None, context_size="5"
+    input_file: str,
+    search_str: str,
+    pages: Tuple = None,
+    context_size="5",
+    low_memory: bool = False,
+    memory_budget: int = None,
 ):
     # Extracts the context of the search string e.g. the surrounding paragraphs
 
     pdfDoc = fitz.open(input_file)
-    # Save the generated PDF to memory buffer
-    BytesIO()
 
     found_strings = []
     # Iterate through pages
@@ -165,6 +414,11 @@ def extract_context(
         # print(hits)
         found_strings.extend(hits)
 
+        if low_memory:
+            # Release the page before loading the next one
+            page = None
+            release_memory(memory_budget)
+
     pdfDoc.close()
 
     return found_strings
@@ -177,6 +431,10 @@ def process_data(
     pages: Tuple = None,
     action: str = "Highlight",
     color: str = "yellow",
+    match_mode: str = "regex",
+    max_edits: int = 1,
+    low_memory: bool = False,
+    memory_budget: int = None,
     **kwargs,
 ):
     """
@@ -184,9 +442,9 @@ def process_data(
     """
     # Open the PDF
     pdfDoc = fitz.open(input_file)
-    # Save the generated PDF to memory buffer
-    output_buffer = BytesIO()
     total_matches = 0
+    # Pages with at least one match
+    hit_pages = []
     # Iterate through pages
     for pg in range(pdfDoc.page_count):
         # If required for specific pages
@@ -195,46 +453,41 @@ def process_data(
                 continue
         # Select the page
         page = pdfDoc[pg]
-        # Get Matching Data
-        # Split page by lines
-        page_lines = page.get_text("text").split("\n")
-
-        matched_values = search_for_text(page_lines, search_str)
-        if matched_values:
-            if action == "Redact":
-                matches_found = redact_matching_data(page, matched_values)
-            elif action == "Frame":
-                matches_found = frame_matching_data(page, matched_values)
-            elif action in (
-                "Squiggly",
-                "FreeText",
-                "Underline",
-                "Strikeout",
-            ):
-                matches_found = highlight_matching_data(
-                    page, matched_values, action, color="black"
-                )
-            elif action == "Highlight":
-                matches_found = highlight_matching_data(
-                    page, matched_values, "Highlight", color=color
-                )
-            total_matches += matches_found
+        # Get Matching Data, the same hits as recorded in a plan
+        matched_areas = [
+            quads
+            for _, quads in find_page_hits(page, search_str, match_mode, max_edits)
+        ]
+        matches_found = annotate_matching_areas(
+            page,
+            matched_areas,
+            action,
+            color=color if action == "Highlight" else "black",
+        )
+        total_matches += matches_found
+        if matches_found:
+            hit_pages.append(pg + 1)
+        if low_memory:
+            # Release the page before loading the next one
+            page = None
+            release_memory(memory_budget)
     print(
         f"{total_matches} Match(es) Found of Search String {search_str} In Input File: {input_file}"
     )
     # Save to output
-    pdfDoc.save(output_buffer)
-    pdfDoc.close()
-    # Save the output buffer to the output file
-    with open(output_file, mode="wb") as f:
-        f.write(output_buffer.getbuffer())
+    save_document(pdfDoc, output_file, low_memory=low_memory)
+    return {"filename": output_file, "search_str": search_str, "pages": hit_pages}
 
 
-def remove_highlght(input_file: str, output_file: str, pages: Tuple = None):
+def remove_highlght(
+    input_file: str,
+    output_file: str,
+    pages: Tuple = None,
+    low_memory: bool = False,
+    memory_budget: int = None,
+):
     # Open the PDF
     pdfDoc = fitz.open(input_file)
-    # Save the generated PDF to memory buffer
-    output_buffer = BytesIO()
     # Initialize a counter for annotations
     annot_found = 0
     # Iterate through pages
@@ -250,14 +503,208 @@ def remove_highlght(input_file: str, output_file: str, pages: Tuple = None):
             annot_found += 1
             page.delete_annot(annot)
             annot = annot.next
+        if low_memory:
+            # Release the page before loading the next one
+            page = None
+            release_memory(memory_budget)
     if annot_found >= 0:
         print(f"Annotation(s) Found In The Input File: {input_file}")
     # Save to output
-    pdfDoc.save(output_buffer)
+    save_document(pdfDoc, output_file, low_memory=low_memory)
+
+
+def quad_coords(quad):
+    """
+    Flattens the quad into the rounded coordinates of its 4 corners
+    """
+    return [
+        round(coord, 2)
+        for point in (quad.ul, quad.ur, quad.ll, quad.lr)
+        for coord in point
+    ]
+
+
+def find_page_hits(page, search_str: str, match_mode: str = "regex", max_edits=1):
+    """
+    Search the page for the search string
+    Returns the matched text and the quads of each hit
+    """
+    if match_mode == "fuzzy":
+        return [
+            (text, [area.quad for area in areas])
+            for text, areas in fuzzy_search_page(page, search_str, max_edits)
+            if areas
+        ]
+    # Split page by lines
+    page_lines = page.get_text("text").split("\n")
+    hits = []
+    # search_for ignores case and finds substrings, so "Language" and "lang"
+    # find quads already recorded for "language"
+    seen_rects = []
+    # Longest values first so the quads of shorter ones fall inside recorded ones
+    values = sorted(
+        dict.fromkeys(search_for_text(page_lines, search_str)), key=len, reverse=True
+    )
+    for val in values:
+        quads = []
+        for quad in page.search_for(val, quads=True):
+            if any(rect.contains(quad.rect) for rect in seen_rects):
+                continue
+            # Tolerate the rounding of the text positions
+            seen_rects.append(quad.rect + (-0.5, -0.5, 0.5, 0.5))
+            quads.append(quad)
+        if quads:
+            hits.append((val, quads))
+    return hits
+
+
+def plan_data(
+    input_file: str,
+    search_str: str,
+    pages: Tuple = None,
+    action: str = "Highlight",
+    color: str = "yellow",
+    match_mode: str = "regex",
+    max_edits: int = 1,
+    low_memory: bool = False,
+    memory_budget: int = None,
+    digest: str = None,
+    **kwargs,
+):
+    """
+    Computes the annotations of the PDF File without applying them
+    """
+    # Open the PDF
+    pdfDoc = fitz.open(input_file)
+    # Same colors as when processing the data
+    color = color if action == "Highlight" else "black"
+    hits = []
+    # Iterate through pages
+    for pg in range(pdfDoc.page_count):
+        # If required for specific pages
+        if pages:
+            if str(pg) not in pages:
+                continue
+        # Select the page
+        page = pdfDoc[pg]
+        for term, quads in find_page_hits(page, search_str, match_mode, max_edits):
+            hits.append(
+                {
+                    "page": pg + 1,
+                    "term": term,
+                    "action": action,
+                    "color": color,
+                    "quads": [quad_coords(quad) for quad in quads],
+                }
+            )
+        if low_memory:
+            # Release the page before loading the next one
+            page = None
+            release_memory(memory_budget)
     pdfDoc.close()
-    # Save the output buffer to the output file
-    with open(output_file, mode="wb") as f:
-        f.write(output_buffer.getbuffer())
+    print(
+        f"{len(hits)} Hit(s) Planned of Search String {search_str} In Input File: {input_file}"
+    )
+    return {
+        "filename": input_file,
+        # Reuse the digest of the folder deduplication when given
+        "file_hash": digest or file_hash(input_file),
+        "search_str": search_str,
+        "hits": hits,
+    }
+
+
+def write_plan(plan_file: str, results):
+    """
+    Writes the planned hits of each file to a JSON plan, gzipped for a .gz plan file
+    """
+    plan = {"version": 1, "files": {}}
+    for result in results:
+        # Identical files share their hits
+        plan["files"].setdefault(
+            result["file_hash"],
+            {"filename": result["filename"], "hits": result["hits"]},
+        )
+    opener = gzip.open if plan_file.endswith(".gz") else open
+    with opener(plan_file, mode="wt", encoding="utf-8") as f:
+        json.dump(plan, f, separators=(",", ":"))
+    print(f"Plan of {len(plan['files'])} file(s) written to {plan_file}")
+
+
+def read_plan(plan_file: str):
+    """
+    Reads a plan written by write_plan
+    """
+    opener = gzip.open if plan_file.endswith(".gz") else open
+    with opener(plan_file, mode="rt", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != 1:
+        raise ValueError(f"Unsupported plan version {plan.get('version')}")
+    return plan
+
+
+def apply_plan(**kwargs):
+    """
+    Adds the annotations of a plan to the PDF File/s without any text extraction
+    Files are matched to the plan by content hash
+    """
+    input_path = kwargs.get("input_path")
+    plan = read_plan(kwargs.get("plan_file"))
+    # Override the action and color of the plan
+    action = kwargs.get("action")
+    color = kwargs.get("color")
+    low_memory = kwargs.get("low_memory", False)
+    memory_budget = kwargs.get("memory_budget")
+
+    if os.path.isfile(input_path):
+        pdf_files = [input_path]
+    else:
+        pdf_files = list_pdf_files(input_path, kwargs.get("recursive"))
+
+    output = []
+    found_hashes = set()
+    for inp_pdf_file in pdf_files:
+        digest = file_hash(inp_pdf_file)
+        if digest not in plan["files"]:
+            print("No planned hits for file =", inp_pdf_file)
+            continue
+        found_hashes.add(digest)
+        output_file = kwargs.get("output_file") or inp_pdf_file
+        print("Applying plan to file =", inp_pdf_file)
+
+        # Group the hits of each page by annotation
+        page_hits = {}
+        for hit in plan["files"][digest]["hits"]:
+            key = (action or hit["action"], color or hit["color"])
+            page_hits.setdefault(hit["page"], {}).setdefault(key, []).append(
+                [
+                    fitz.Quad(quad[0:2], quad[2:4], quad[4:6], quad[6:8])
+                    for quad in hit["quads"]
+                ]
+            )
+
+        # Open the PDF
+        pdfDoc = fitz.open(inp_pdf_file)
+        total_matches = 0
+        for page_num in sorted(page_hits):
+            page = pdfDoc[page_num - 1]
+            for (hit_action, hit_color), matched_areas in page_hits[page_num].items():
+                total_matches += annotate_matching_areas(
+                    page, matched_areas, hit_action, color=hit_color
+                )
+            if low_memory:
+                # Release the page before loading the next one
+                page = None
+                release_memory(memory_budget)
+        print(f"{total_matches} Planned Hit(s) Applied In Input File: {inp_pdf_file}")
+        # Save to output
+        save_document(pdfDoc, output_file, low_memory=low_memory)
+        output.append({"filename": output_file, "pages": sorted(page_hits)})
+
+    missing = len(set(plan["files"]) - found_hashes)
+    if missing:
+        print(f"{missing} planned file(s) not found in {input_path}")
+    return output
 
 
 def process_file(**kwargs):
@@ -275,10 +722,24 @@ def process_file(**kwargs):
     # Redact, Frame, Highlight, Squiggly, Underline, Strikeout, Remove
     action = kwargs.get("action")
     color = kwargs.get("color")
+    # Exact regex or approximate matching
+    match_mode = kwargs.get("match_mode") or "regex"
+    max_edits = kwargs.get("max_edits")
+    if max_edits is None:
+        max_edits = 1
+    # Release page resources after each page, within a memory budget in MB
+    low_memory = kwargs.get("low_memory", False)
+    memory_budget = kwargs.get("memory_budget")
 
     if action == "Remove":
         # Remove the Highlights except Redactions
-        remove_highlght(input_file=input_file, output_file=output_file, pages=pages)
+        remove_highlght(
+            input_file=input_file,
+            output_file=output_file,
+            pages=pages,
+            low_memory=low_memory,
+            memory_budget=memory_budget,
+        )
         return None
     elif action == "Extract Context":
         # Remove the Highlights except Redactions
@@ -287,20 +748,56 @@ def process_file(**kwargs):
             search_str=search_str,
             pages=pages,
             context_size=kwargs.get("context_size"),
+            low_memory=low_memory,
+            memory_budget=memory_budget,
         )
 
         print("context size", kwargs.get("context_size"))
         return {"filename": input_file, "search_str": search_str, "hits": hits}
+    elif kwargs.get("plan_only"):
+        # Compute the hits without annotating
+        return plan_data(
+            input_file=input_file,
+            search_str=search_str,
+            pages=pages,
+            action=action,
+            color=color,
+            match_mode=match_mode,
+            max_edits=max_edits,
+            low_memory=low_memory,
+            memory_budget=memory_budget,
+            digest=kwargs.get("digest"),
+        )
     else:
-        process_data(
+        return process_data(
             input_file=input_file,
             output_file=output_file,
             search_str=search_str,
             pages=pages,
             action=action,
             color=color,
+            match_mode=match_mode,
+            max_edits=max_edits,
+            low_memory=low_memory,
+            memory_budget=memory_budget,
         )
-        return None
+
+
+def list_pdf_files(input_folder: str, recursive: bool = True):
+    """
+    Lists the PDF Files within a specified path
+    """
+    pdf_files = []
+    for foldername, dirs, filenames in os.walk(input_folder):
+        for filename in filenames:
+            # Check if pdf file
+            if not filename.endswith(".pdf"):
+                continue
+            # PDF File found
+            pdf_files.append(os.path.join(foldername, filename))
+        if not recursive:
+            break
+    return pdf_files
 
 
 def process_folder(**kwargs):
@@ -317,32 +814,67 @@ def process_folder(**kwargs):
     pages = kwargs.get("pages")
     color = kwargs.get("color")
     context_size = kwargs.get("context_size")
+    match_mode = kwargs.get("match_mode")
+    max_edits = kwargs.get("max_edits")
+    low_memory = kwargs.get("low_memory", False)
+    memory_budget = kwargs.get("memory_budget")
     # Loop though the files within the input folder.
 
+    # Run content-hash deduplication of identical files
+    deduplicate = kwargs.get("deduplicate", True)
+
+    # Only compute the hits for a plan
+    plan_only = kwargs.get("plan_only", False)
+
+    # Collect the pdf files before processing as in place edits change the content
+    pdf_files = list_pdf_files(input_folder, recursive)
+
+    # Group the files by content so each unique content is processed once
+    groups = {}
+    for inp_pdf_file in pdf_files:
+        key = file_hash(inp_pdf_file) if deduplicate else inp_pdf_file
+        groups.setdefault(key, []).append(inp_pdf_file)
+
     collated_output = []
-    for foldername, dirs, filenames in os.walk(input_folder):
-        for filename in filenames:
-            # Check if pdf file
-            if not filename.endswith(".pdf"):
-                continue
-            # PDF File found
-            inp_pdf_file = os.path.join(foldername, filename)
-            print("Processing file =", inp_pdf_file, kwargs.get("context_size"))
-            output = process_file(
-                input_file=inp_pdf_file,
-                output_file=None,
-                search_str=search_str,
-                action=action,
-                pages=pages,
-                color=color,
-                context_size=context_size,
-            )
+    skipped_bytes = 0
+    for key, (inp_pdf_file, *duplicates) in groups.items():
+        print("Processing file =", inp_pdf_file, kwargs.get("context_size"))
+        output = process_file(
+            input_file=inp_pdf_file,
+            output_file=None,
+            search_str=search_str,
+            action=action,
+            pages=pages,
+            color=color,
+            context_size=context_size,
+            match_mode=match_mode,
+            max_edits=max_edits,
+            low_memory=low_memory,
+            memory_budget=memory_budget,
+            plan_only=plan_only,
+            digest=key if deduplicate else None,
+        )
 
-            if action == "Extract Context":
-                # print(output)
-                collated_output.append(output)
-        if not recursive:
-            break
+        if output is not None:
+            # print(output)
+            collated_output.append(output)
+        # Fan the result out to the identical files
+        for duplicate in duplicates:
+            print("Reusing result of", inp_pdf_file, "for duplicate file =", duplicate)
+            skipped_bytes += os.path.getsize(duplicate)
+            if action != "Extract Context" and not plan_only:
+                shutil.copyfile(inp_pdf_file, duplicate)
+            if output is not None:
+                collated_output.append({**output, "filename": duplicate})
+
+    skipped_files = len(pdf_files) - len(groups)
+    print("## Run Summary #######################################################")
+    print(f"Files found:{len(pdf_files)}")
+    print(f"Unique files processed:{len(groups)}")
+    print(
+        f"Duplicate files skipped:{skipped_files} ({skipped_bytes / 2**20:.1f} MB)"
+    )
+    print("######################################################################")
     return collated_output
 
 
@@ -386,10 +918,11 @@ def parse_args():
             "Strikeout",
             "FreeText",
             "Remove",
+            "ApplyPlan",
         ],
         type=str,
         default="Highlight",
-        help="Choose whether to Redact or to Frame or to Highlight or to Squiggly or to Underline or to Strikeout or to Remove",
+        help="Choose whether to Redact or to Frame or to Highlight or to Squiggly or to Underline or to Strikeout or to Remove or to ApplyPlan",
     )
     parser.add_argument(
         "-p",
@@ -398,8 +931,54 @@ def parse_args():
         type=tuple,
         help="Enter the pages to consider e.g.: [2,4]",
     )
+    parser.add_argument(
+        "-l",
+        "--low_memory",
+        dest="low_memory",
+        default=False,
+        type=lambda x: (str(x).lower() in ["true", "1", "yes"]),
+        help="Release page resources after each page and write the output without an in-memory copy",
+    )
+    parser.add_argument(
+        "-b",
+        "--memory_budget",
+        dest="memory_budget",
+        type=int,
+        help="Enter the memory budget in MB of the low memory mode, caches are flushed after every page without one",
+    )
     action = parser.parse_known_args()[0].action
     if action != "Remove":
+        parser.add_argument(
+            "--plan",
+            dest="plan_file",
+            type=str,
+            required=action == "ApplyPlan",
+            help="Enter the plan file to write the hits to instead of annotating, or to apply with ApplyPlan",
+        )
+    if action == "ApplyPlan":
+        parser.add_argument(
+            "-c",
+            "--color",
+            dest="color",
+            type=str,
+            help="Enter a color to override the colors of the plan",
+        )
+        parser.add_argument(
+            "--plan_action",
+            dest="plan_action",
+            choices=[
+                "Redact",
+                "Frame",
+                "Highlight",
+                "Squiggly",
+                "Underline",
+                "Strikeout",
+                "FreeText",
+            ],
+            type=str,
+            help="Choose an action to override the actions of the plan",
+        )
+    elif action != "Remove":
         parser.add_argument(
             "-s",
             "--search_str",
@@ -417,6 +996,23 @@ def parse_args():
             required=True,
             help="Enter a valid color",
         )
+        parser.add_argument(
+            "-m",
+            "--match_mode",
+            dest="match_mode",
+            choices=["regex", "fuzzy"],
+            type=str,
+            default="regex",
+            help="Match the search string as a regex or approximately, tolerating ligatures, hyphenation and OCR noise",
+        )
+        parser.add_argument(
+            "-k",
+            "--max_edits",
+            dest="max_edits",
+            type=int,
+            default=1,
+            help="Maximum number of edits of an approximate match",
+        )
 
     path = parser.parse_known_args()[0].input_path
     if os.path.isfile(path):
@@ -436,6 +1032,14 @@ def parse_args():
             type=lambda x: (str(x).lower() in ["true", "1", "yes"]),
             help="Process Recursively or Non-Recursively",
         )
+        parser.add_argument(
+            "-d",
+            "--deduplicate",
+            dest="deduplicate",
+            default=True,
+            type=lambda x: (str(x).lower() in ["true", "1", "yes"]),
+            help="Process byte-identical files once and copy the result to the duplicates",
+        )
     args = vars(parser.parse_args())
     # To Display The Command Line Arguments
     print("## Command Arguments #################################################")
@@ -445,8 +1049,20 @@ def parse_args():
 
 
 def edit_pdfs(args):
+    # If Plan to apply
+    if args.get("action") == "ApplyPlan":
+        output = apply_plan(
+            input_path=args.get("input_path"),
+            plan_file=args.get("plan_file"),
+            output_file=args.get("output_file"),
+            recursive=args.get("recursive"),
+            action=args.get("plan_action"),
+            color=args.get("color"),
+            low_memory=args.get("low_memory", False),
+            memory_budget=args.get("memory_budget"),
+        )
     # If File Path
-    if os.path.isfile(args.get("input_path")):
+    elif os.path.isfile(args.get("input_path")):
         # Extracting File Info
         extract_info(input_file=args.get("input_path"))
         # Process a file
@@ -460,6 +1076,11 @@ def edit_pdfs(args):
             pages=args.get("pages"),
             action=args.get("action"),
             context_size=args.get("context_size"),
+            match_mode=args.get("match_mode"),
+            max_edits=args.get("max_edits"),
+            low_memory=args.get("low_memory", False),
+            memory_budget=args.get("memory_budget"),
+            plan_only=bool(args.get("plan_file")),
         )
         output = [output]
     # If Folder Path
@@ -475,7 +1096,27 @@ def edit_pdfs(args):
             pages=args.get("pages"),
             recursive=args.get("recursive"),
             context_size=args.get("context_size"),
+            match_mode=args.get("match_mode"),
+            max_edits=args.get("max_edits"),
+            deduplicate=args.get("deduplicate", True),
+            low_memory=args.get("low_memory", False),
+            memory_budget=args.get("memory_budget"),
+            plan_only=bool(args.get("plan_file")),
         )
+    if args.get("low_memory"):
+        # Report the peak memory to size the machines running large PDFs
+        peak = peak_memory()
+        message = "unknown" if peak is None else f"{peak:.0f} MB"
+        if args.get("memory_budget") is not None:
+            message += f" (budget {args.get('memory_budget')} MB)"
+        print(f"Peak memory: {message}")
+    if args.get("plan_file") and args.get("action") not in (
+        "ApplyPlan",
+        "Extract Context",
+        "Remove",
+    ):
+        # Write the hits for a later ApplyPlan run
+        write_plan(args.get("plan_file"), output)
     if args.get("action") == "Extract Context":
         # Piece together the extracted output for all files
 
@@ -511,36 +1152,12 @@ def edit_pdfs(args):
         df.to_csv(output_name, index=False)
 
         return df
+    # The output file and the pages with hits of each processed file
+    return [result for result in output if result is not None]
 
 
 if __name__ == "__main__":
     # Parsing command line arguments entered by user
     args = parse_args()
-    # If File Path
-    if os.path.isfile(args.get("input_path")):
-        # Extracting File Info
-        extract_info(input_file=args.get("input_path"))
-        # Process a file
-        process_file(
-            input_file=args.get("input_path"),
-            output_file=args.get("output_file"),
-            search_str=args.get("search_str")
-            if "search_str" in (args.keys())
-            else None,
-            color=args.get("color") if "color" in (args.keys()) else "yellow",
-            pages=args.get("pages"),
-            action=args.get("action"),
-        )
-    # If Folder Path
-    elif os.path.isdir(args.get("input_path")):
-        # Process a folder
-        process_folder(
-            input_folder=args.get("input_path"),
-            search_str=args.get("search_str")
-            if "search_str" in (args.keys())
-            else None,
-            color=args.get("color") if "color" in (args.keys()) else "yellow",
-            action=args.get("action"),
-            pages=args.get("pages"),
-            recursive=args.get("recursive"),
-        )
+    # Process the file or folder
+    edit_pdfs(args)
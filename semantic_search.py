@@ -0,0 +1,359 @@
+# Import Libraries
+import argparse
+import os
+import re
+import zlib
+from io import BytesIO
+
+import fitz
+import numpy as np
+import pandas as pd
+
+from pdf_highlighter import (
+    annotate_matching_areas,
+    file_hash,
+    is_valid_path,
+    list_pdf_files,
+    normalize_text,
+)
+
+# Number of hashed features of the TF-IDF vectors
+N_FEATURES = 2**18
+# Roughly how many words a passage holds
+PASSAGE_WORDS = 120
+# Folder of the per file passage cache
+CACHE_DIR = ".semantic_index"
+
+
+def tokenize(text: str):
+    """
+    Splits the normalized text into words
+    """
+    return re.findall(r"\w+", normalize_text(text)[0])
+
+
+def hash_tokens(tokens):
+    """
+    Maps the tokens to their feature indices
+    Returns the distinct features and their counts
+    """
+    # crc32 is stable across runs unlike the builtin hash
+    features = np.array(
+        [zlib.crc32(token.encode("utf-8")) % N_FEATURES for token in tokens],
+        dtype=np.int64,
+    )
+    return np.unique(features, return_counts=True)
+
+
+def extract_passages(input_file: str):
+    """
+    Splits the PDF File into passages of consecutive text blocks
+    Returns the page, bounding box and text of each passage
+    """
+    pdfDoc = fitz.open(input_file)
+    passages = []
+    for pg in range(pdfDoc.page_count):
+        page = pdfDoc[pg]
+        texts = []
+        rect = None
+        words = 0
+        for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+            # Skip image blocks
+            if block_type != 0:
+                continue
+            block_words = len(text.split())
+            if texts and words + block_words > PASSAGE_WORDS:
+                passages.append((pg, tuple(rect), " ".join(texts)))
+                texts, rect, words = [], None, 0
+            texts.append(text.replace("-\n", "").replace("\n", " ").strip())
+            block_rect = fitz.Rect(x0, y0, x1, y1)
+            rect = block_rect if rect is None else rect | block_rect
+            words += block_words
+        if texts:
+            passages.append((pg, tuple(rect), " ".join(texts)))
+    pdfDoc.close()
+    return passages
+
+
+def load_file_index(input_file: str, cache_dir: str = CACHE_DIR):
+    """
+    Loads the passages and term counts of the PDF File
+    Extracts them and caches them by file hash on the first use
+    """
+    cache_file = os.path.join(cache_dir, file_hash(input_file) + ".npz")
+    if not os.path.isfile(cache_file):
+        passages = extract_passages(input_file)
+        indptr = [0]
+        indices = []
+        counts = []
+        for _, _, text in passages:
+            features, feature_counts = hash_tokens(tokenize(text))
+            indices.append(features)
+            counts.append(feature_counts)
+            indptr.append(indptr[-1] + len(features))
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file so an interrupted run leaves no broken cache
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, mode="wb") as f:
+            np.savez_compressed(
+                f,
+                pages=np.array([pg for pg, _, _ in passages], dtype=np.int32),
+                rects=np.array(
+                    [rect for _, rect, _ in passages], dtype=np.float32
+                ).reshape(-1, 4),
+                texts=np.array([text for _, _, text in passages], dtype=str),
+                indptr=np.array(indptr, dtype=np.int64),
+                indices=np.concatenate(indices + [np.zeros(0)]).astype(np.int32),
+                counts=np.concatenate(counts + [np.zeros(0)]).astype(np.float32),
+            )
+        os.replace(tmp_file, cache_file)
+    with np.load(cache_file) as data:
+        return {key: data[key] for key in data.files}
+
+
+def build_index(input_path: str, recursive: bool = True, cache_dir: str = CACHE_DIR):
+    """
+    Builds the TF-IDF index of the passages of a PDF File or of a folder of PDF Files
+    """
+    if os.path.isfile(input_path):
+        pdf_files = [input_path]
+    else:
+        pdf_files = list_pdf_files(input_path, recursive)
+
+    file_ids, pages, rects, texts, rows, indices, counts = [], [], [], [], [], [], []
+    n_passages = 0
+    for file_id, pdf_file in enumerate(pdf_files):
+        print("Indexing file =", pdf_file)
+        file_index = load_file_index(pdf_file, cache_dir)
+        n_file_passages = len(file_index["pages"])
+        file_ids.append(np.full(n_file_passages, file_id, dtype=np.int32))
+        pages.append(file_index["pages"])
+        rects.append(file_index["rects"])
+        texts.append(file_index["texts"])
+        # Row of each stored term count
+        rows.append(
+            n_passages
+            + np.repeat(
+                np.arange(n_file_passages), np.diff(file_index["indptr"])
+            ).astype(np.int64)
+        )
+        indices.append(file_index["indices"])
+        counts.append(file_index["counts"])
+        n_passages += n_file_passages
+
+    rows = np.concatenate(rows + [np.zeros(0, dtype=np.int64)])
+    indices = np.concatenate(indices + [np.zeros(0, dtype=np.int32)])
+    counts = np.concatenate(counts + [np.zeros(0, dtype=np.float32)])
+
+    # Smoothed inverse document frequency of each feature
+    df = np.bincount(indices, minlength=N_FEATURES)
+    idf = (np.log((1 + n_passages) / (1 + df)) + 1).astype(np.float32)
+    # Sublinear term frequency weights, normalized per passage
+    weights = (1 + np.log(counts)) * idf[indices]
+    norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=n_passages))
+    weights = weights / norms[rows]
+
+    print(f"{n_passages} passage(s) indexed from {len(pdf_files)} file(s)")
+    return {
+        "filenames": pdf_files,
+        "file_ids": np.concatenate(file_ids + [np.zeros(0, dtype=np.int32)]),
+        "pages": np.concatenate(pages + [np.zeros(0, dtype=np.int32)]),
+        "rects": np.concatenate(rects + [np.zeros((0, 4), dtype=np.float32)]),
+        "texts": np.concatenate(texts + [np.zeros(0, dtype=str)]),
+        "rows": rows,
+        "indices": indices,
+        "weights": weights.astype(np.float32),
+        "idf": idf,
+    }
+
+
+def search_index(index, queries, top_k: int = 5):
+    """
+    Scores every passage against the queries with the cosine similarity
+    Returns the top_k passages of each query
+    """
+    n_passages = len(index["pages"])
+    # Vectorize the queries
+    query_matrix = np.zeros((len(queries), N_FEATURES), dtype=np.float32)
+    for i, query in enumerate(queries):
+        features, counts = hash_tokens(tokenize(query))
+        query_matrix[i, features] = (1 + np.log(counts)) * index["idf"][features]
+        norm = np.linalg.norm(query_matrix[i])
+        if norm > 0:
+            query_matrix[i] /= norm
+
+    # Only the stored weights of the query features contribute to the scores
+    mask = query_matrix.any(axis=0)[index["indices"]]
+    rows = index["rows"][mask]
+    contributions = query_matrix[:, index["indices"][mask]] * index["weights"][mask]
+    scores = np.zeros((len(queries), n_passages), dtype=np.float32)
+    for i in range(len(queries)):
+        scores[i] = np.bincount(rows, weights=contributions[i], minlength=n_passages)
+
+    results = []
+    k = min(top_k, n_passages)
+    for i, query in enumerate(queries):
+        if k == 0:
+            continue
+        # Select the top k passages before sorting them
+        top = np.argpartition(-scores[i], k - 1)[:k]
+        top = top[np.argsort(-scores[i][top])]
+        for passage in top:
+            if scores[i][passage] <= 0:
+                continue
+            results.append(
+                {
+                    "query": query,
+                    "score": float(scores[i][passage]),
+                    "filename": index["filenames"][index["file_ids"][passage]],
+                    "page": int(index["pages"][passage]) + 1,
+                    "excerpt": str(index["texts"][passage]),
+                    "rect": tuple(float(x) for x in index["rects"][passage]),
+                }
+            )
+    return results
+
+
+def highlight_passages(results, color: str = "yellow", cache_dir: str = CACHE_DIR):
+    """
+    Highlights the found passages in their PDF Files
+    """
+    # A passage found by several queries is highlighted once
+    passages = {}
+    for result in results:
+        passages.setdefault(result["filename"], {}).setdefault(
+            (result["page"], result["rect"])
+        )
+
+    for filename, file_passages in passages.items():
+        cache_file = os.path.join(cache_dir, file_hash(filename) + ".npz")
+        # Open the PDF
+        pdfDoc = fitz.open(filename)
+        # Save the generated PDF to memory buffer
+        output_buffer = BytesIO()
+        for page_num, rect in file_passages:
+            page = pdfDoc[page_num - 1]
+            annotate_matching_areas(page, [[fitz.Rect(rect)]], "Highlight", color=color)
+        # Save to output
+        pdfDoc.save(output_buffer)
+        pdfDoc.close()
+        # Save the output buffer to the file
+        with open(filename, mode="wb") as f:
+            f.write(output_buffer.getbuffer())
+
+        # Highlights leave the text unchanged so the cached passages stay valid
+        if os.path.isfile(cache_file):
+            os.replace(
+                cache_file, os.path.join(cache_dir, file_hash(filename) + ".npz")
+            )
+
+
+def semantic_search(args):
+    """
+    Answers the queries with the closest passages of the PDF File/s
+    """
+    columns = ["query", "score", "filename", "page", "excerpt"]
+    if not args.get("queries"):
+        # Nothing to search, skip building the index
+        print("No query to search")
+        return pd.DataFrame([], columns=columns)
+
+    index = build_index(
+        args.get("input_path"),
+        recursive=args.get("recursive", True),
+        cache_dir=args.get("cache_dir") or CACHE_DIR,
+    )
+    results = search_index(index, args.get("queries"), top_k=args.get("top_k") or 5)
+    if args.get("highlight"):
+        highlight_passages(
+            results,
+            color=args.get("color") or "yellow",
+            cache_dir=args.get("cache_dir") or CACHE_DIR,
+        )
+
+    df = pd.DataFrame(results, columns=columns)
+
+    # Make the search result be based on the first query and input path
+    output_name = (
+        "semantic_search_"
+        + args.get("queries")[0]
+        + "_"
+        + args.get("input_path").split("/")[-1]
+        + ".csv"
+    )
+    df.to_csv(output_name, index=False)
+
+    return df
+
+
+def parse_args():
+    """
+    Get user command line parameters
+    """
+    parser = argparse.ArgumentParser(description="Available Options")
+    parser.add_argument(
+        "-i",
+        "--input_path",
+        dest="input_path",
+        type=is_valid_path,
+        required=True,
+        help="Enter the path of the file or the folder to search",
+    )
+    parser.add_argument(
+        "-q",
+        "--query",
+        dest="queries",
+        action="append",
+        required=True,
+        help="Enter a query, repeat to search several queries at once",
+    )
+    parser.add_argument(
+        "-k",
+        "--top_k",
+        dest="top_k",
+        type=int,
+        default=5,
+        help="Enter the number of passages to return per query",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        dest="recursive",
+        default=True,
+        type=lambda x: (str(x).lower() in ["true", "1", "yes"]),
+        help="Search Recursively or Non-Recursively",
+    )
+    parser.add_argument(
+        "--highlight",
+        dest="highlight",
+        default=False,
+        type=lambda x: (str(x).lower() in ["true", "1", "yes"]),
+        help="Highlight the found passages in the PDF File/s",
+    )
+    parser.add_argument(
+        "-c",
+        "--color",
+        dest="color",
+        type=str,
+        default="yellow",
+        help="Enter a valid color",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        dest="cache_dir",
+        type=str,
+        default=CACHE_DIR,
+        help="Enter the folder of the passage cache",
+    )
+    args = vars(parser.parse_args())
+    # To Display The Command Line Arguments
+    print("## Command Arguments #################################################")
+    print("\n".join("{}:{}".format(i, j) for i, j in args.items()))
+    print("######################################################################")
+    return args
+
+
+if __name__ == "__main__":
+    # Parsing command line arguments entered by user
+    args = parse_args()
+    print(semantic_search(args))
@@ -0,0 +1,150 @@
+import shutil
+
+import fitz
+import pytest
+
+import pdf_highlighter
+from pdf_highlighter import (
+    apply_plan,
+    approximate_search,
+    normalize_text,
+    plan_data,
+    process_data,
+    process_folder,
+    write_plan,
+)
+
+
+def annotations(path):
+    pdfDoc = fitz.open(path)
+    return sorted(
+        (
+            page.number,
+            annot.type[1],
+            annot.colors["stroke"],
+            [coord for point in annot.vertices for coord in point],
+        )
+        for page in pdfDoc
+        for annot in page.annots()
+    )
+
+
+def make_pdf(path, text):
+    pdfDoc = fitz.open()
+    pdfDoc.new_page().insert_text((72, 72), text)
+    pdfDoc.save(path)
+    pdfDoc.close()
+
+
+def test_approximate_search_adjacent_exact_repeats():
+    assert list(approximate_search("abbbbc", "bb", 0)) == [(1, 3, 0), (3, 5, 0)]
+    assert list(approximate_search("abab", "ab", 1)) == [(0, 2, 0), (2, 4, 0)]
+
+
+def test_approximate_search_hyphenated_match():
+    page_text = "the classi-\nfication of data"
+    text, offsets = normalize_text(page_text)
+    [(start, end, edits)] = approximate_search(text, "classification", 1)
+    assert page_text[offsets[start] : offsets[end - 1] + 1] == "classi-\nfication"
+    assert edits == 0
+
+
+def test_plan_of_mixed_case_term_applies_one_annotation_per_occurrence(tmp_path):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(input_file, "Language models model language")
+    plan_file = str(tmp_path / "plan.json.gz")
+    write_plan(plan_file, [plan_data(input_file=input_file, search_str="language")])
+
+    output_file = str(tmp_path / "output.pdf")
+    shutil.copyfile(input_file, output_file)
+    apply_plan(input_path=output_file, plan_file=plan_file)
+
+    pdfDoc = fitz.open(output_file)
+    # Each quad adds 4 vertices to its annotation
+    quads = [len(annot.vertices) // 4 for annot in pdfDoc[0].annots()]
+    assert sum(quads) == 2
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Language models, language data and a lang. model",
+        # The shorter value comes first on the page
+        "a lang. model, Language models and language data",
+    ],
+)
+def test_applied_plan_matches_direct_run(tmp_path, text):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(input_file, text)
+    plan_file = str(tmp_path / "plan.json")
+    write_plan(
+        plan_file,
+        [plan_data(input_file=input_file, search_str="lang\\w*", color="green")],
+    )
+
+    direct_file = str(tmp_path / "direct.pdf")
+    process_data(input_file, direct_file, "lang\\w*", color="green")
+    planned_file = str(tmp_path / "planned.pdf")
+    shutil.copyfile(input_file, planned_file)
+    apply_plan(input_path=planned_file, plan_file=plan_file)
+
+    direct, planned = annotations(direct_file), annotations(planned_file)
+    assert [annot[:3] for annot in direct] == [annot[:3] for annot in planned]
+    for direct_annot, planned_annot in zip(direct, planned):
+        # Plans store the coordinates with 2 decimals
+        assert direct_annot[3] == pytest.approx(planned_annot[3], abs=0.01)
+    # One quad of 4 vertices of 2 coordinates per occurrence
+    assert sum(len(annot[3]) for annot in direct) == 3 * 4 * 2
+
+
+def test_process_folder_processes_identical_files_once(tmp_path, monkeypatch):
+    original_file = str(tmp_path / "original.pdf")
+    make_pdf(original_file, "Language models model language")
+    (tmp_path / "copies").mkdir()
+    duplicate_file = str(tmp_path / "copies" / "duplicate.pdf")
+    shutil.copyfile(original_file, duplicate_file)
+
+    processed = []
+    process_file = pdf_highlighter.process_file
+
+    def counting_process_file(**kwargs):
+        processed.append(kwargs["input_file"])
+        return process_file(**kwargs)
+
+    monkeypatch.setattr(pdf_highlighter, "process_file", counting_process_file)
+
+    output = process_folder(
+        input_folder=str(tmp_path),
+        search_str="model",
+        action="Extract Context",
+        recursive=True,
+        context_size="1",
+    )
+    assert len(processed) == 1
+    assert sorted(result["filename"] for result in output) == sorted(
+        [original_file, duplicate_file]
+    )
+    assert output[0]["hits"] == output[1]["hits"] != []
+
+    processed.clear()
+    process_folder(
+        input_folder=str(tmp_path),
+        search_str="model",
+        action="Highlight",
+        color="yellow",
+        recursive=True,
+    )
+    [processed_file] = processed
+    assert len(annotations(processed_file)) > 0
+    with open(original_file, "rb") as original, open(duplicate_file, "rb") as copy:
+        assert original.read() == copy.read()
+
+
+def test_low_memory_process_data_overwrites_input_file(tmp_path):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(input_file, "Language models model language")
+
+    process_data(input_file, input_file, "model", low_memory=True)
+
+    assert len(annotations(input_file)) > 0
+    assert list(tmp_path.glob("tmp*.pdf")) == []
@@ -0,0 +1,69 @@
+import os
+
+import fitz
+
+import semantic_search
+from pdf_highlighter import file_hash
+from semantic_search import (
+    build_index,
+    highlight_passages,
+    load_file_index,
+    search_index,
+)
+
+
+def make_pdf(path, page_texts):
+    pdfDoc = fitz.open()
+    for text in page_texts:
+        pdfDoc.new_page().insert_text((72, 72), text)
+    pdfDoc.save(path)
+    pdfDoc.close()
+
+
+def test_search_index_ranks_matching_passage_first(tmp_path):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(
+        input_file,
+        [
+            "Masked language models predict hidden tokens",
+            "Entropy and heat in thermodynamics",
+            "Bread is baked in an oven",
+        ],
+    )
+    index = build_index(input_file, cache_dir=str(tmp_path / "cache"))
+
+    results = search_index(index, ["thermodynamics entropy"], top_k=3)
+
+    assert results[0]["page"] == 2
+    assert results[0]["filename"] == input_file
+
+
+def test_load_file_index_reads_cache(tmp_path, monkeypatch):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(input_file, ["Entropy and heat in thermodynamics"])
+    cache_dir = str(tmp_path / "cache")
+    first = load_file_index(input_file, cache_dir)
+
+    def extract_passages(input_file):
+        raise AssertionError("cached passages extracted again")
+
+    monkeypatch.setattr(semantic_search, "extract_passages", extract_passages)
+    second = load_file_index(input_file, cache_dir)
+
+    assert list(second["texts"]) == list(first["texts"])
+    assert os.listdir(cache_dir) == [file_hash(input_file) + ".npz"]
+
+
+def test_highlight_passages_moves_cache_entry(tmp_path):
+    input_file = str(tmp_path / "input.pdf")
+    make_pdf(input_file, ["Entropy and heat in thermodynamics"])
+    cache_dir = str(tmp_path / "cache")
+    index = build_index(input_file, cache_dir=cache_dir)
+    old_hash = file_hash(input_file)
+
+    highlight_passages(search_index(index, ["entropy"]), cache_dir=cache_dir)
+
+    new_hash = file_hash(input_file)
+    assert new_hash != old_hash
+    assert os.listdir(cache_dir) == [new_hash + ".npz"]
+    assert len(list(fitz.open(input_file)[0].annots())) == 1